@@ -1,17 +1,16 @@
 import json
-import boto3
 from datetime import datetime
 
-# Cliente de DynamoDB
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('Facturas')
+# Cliente de DynamoDB compartido (ver Recursos.py)
+from Recursos import tabla_facturas
+from Respuestas import con_evento_decodificado
 
 def actualizar_factura(factura_id, compra_modificada, tenant_id):
     """Actualiza una factura existente"""
     try:
         
         # Verificar que la factura existe
-        response = table.get_item(
+        response = tabla_facturas().get_item(
             Key={
                 'tenant_id': tenant_id,
                 'factura_id': factura_id
@@ -29,7 +28,7 @@ def actualizar_factura(factura_id, compra_modificada, tenant_id):
             ':fecha_act': datetime.utcnow().isoformat()
         }
         
-        table.update_item(
+        tabla_facturas().update_item(
             Key={
                 'tenant_id': tenant_id,
                 'factura_id': factura_id
@@ -42,6 +41,7 @@ def actualizar_factura(factura_id, compra_modificada, tenant_id):
     except Exception as e:
         return {'error': f"Error al actualizar factura: {str(e)}"}
 
+@con_evento_decodificado
 def lambda_handler(event, context):
     try:
         # Parseo robusto del body
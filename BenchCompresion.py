@@ -0,0 +1,96 @@
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+import Respuestas
+
+# Benchmark de compresión de respuestas: latencia vs bytes ahorrados sobre
+# páginas realistas de ListarFacturas (facturas con productos y usuario_info).
+#   python BenchCompresion.py [repeticiones] > bench_output.txt
+
+NOMBRES = ['Ana', 'Luis', 'María José', 'Carlos', 'Lucía', 'Jorge', 'Sofía', 'Andrés']
+PRODUCTOS = [f'Producto {n} - {c}' for n in ('Laptop', 'Mouse', 'Teclado', 'Monitor', 'Cable', 'Silla')
+             for c in ('negro', 'blanco', 'gris')]
+
+def factura_ejemplo(rng, tenant_id):
+    productos = []
+    for _ in range(rng.randint(2, 8)):
+        precio = Decimal(rng.randint(500, 250000)) / 100
+        cantidad = rng.randint(1, 5)
+        productos.append({
+            'id_prod': str(uuid.UUID(int=rng.getrandbits(128))),
+            'nombre': rng.choice(PRODUCTOS),
+            'precio_unitario': precio,
+            'cantidad': cantidad,
+            'subtotal': precio * cantidad
+        })
+    nombre = rng.choice(NOMBRES)
+    return {
+        'factura_id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'tenant_id': tenant_id,
+        'fecha': '2026-10-19',
+        'fecha_creacion': '2026-10-19T12:34:56.789012',
+        'usuario_info': {
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'tenant_id': tenant_id,
+            'nombres': nombre,
+            'apellidos': 'Pérez García',
+            'email': f"{nombre.split()[0].lower()}@example.com",
+            'telefono': f"+51 9{rng.randint(10000000, 99999999)}",
+            'direccion': {'calle': 'Av. Siempre Viva 742', 'ciudad': 'Lima', 'pais': 'Perú', 'codigo_postal': '15001'}
+        },
+        'productos': productos,
+        'total': sum(p['subtotal'] for p in productos),
+        'estado': 'activa',
+        'productos_fallidos': []
+    }
+
+def pagina(cantidad, semilla=42):
+    """Body tal como lo serializa ListarFacturas"""
+    rng = random.Random(semilla)
+    facturas = [factura_ejemplo(rng, 'tenant-demo') for _ in range(cantidad)]
+    return json.dumps({
+        'mensaje': 'Facturas encontradas correctamente',
+        'cantidad': len(facturas),
+        'facturas': facturas
+    }, indent=2, ensure_ascii=False, default=str)
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    configuraciones = [('gzip', n) for n in (1, 6, 9)]
+    if Respuestas.brotli:
+        configuraciones += [('br', n) for n in (1, 4, 6, 11)]
+    else:
+        print("(brotli no instalado: solo se mide gzip, igual que en Lambda)\n")
+
+    print(f"{'facturas':>8} {'original':>10} {'codif.':>6} {'nivel':>5} {'comprimido':>10} {'base64':>8} {'ahorro':>7} {'ms':>8}")
+    for cantidad in (1, 10, 50, 100):
+        body = pagina(cantidad)
+        datos = body.encode('utf-8')
+        for codificacion, nivel in configuraciones:
+            ms, comprimido = medir(lambda: Respuestas.comprimir(datos, codificacion, nivel), repeticiones)
+            base64_len = 4 * ((len(comprimido) + 2) // 3)
+            ahorro = 1 - base64_len / len(datos)
+            print(f"{cantidad:>8} {len(datos):>10} {codificacion:>6} {nivel:>5} {len(comprimido):>10} {base64_len:>8} {ahorro:>7.1%} {ms:>8.3f}")
+
+        # Costo total de la ruta compartida (elección, compresión y base64)
+        evento = {'headers': {'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate, br'}}
+        respuesta = {'statusCode': 200, 'headers': {'Content-Type': 'application/json'}, 'body': body}
+        ms, final = medir(lambda: Respuestas.comprimir_respuesta(evento, respuesta), repeticiones)
+        codificacion = final['headers'].get('Content-Encoding', '-')
+        print(f"{cantidad:>8} {'comprimir_respuesta':>24} {codificacion:>10} {len(final['body']):>8} {'':>7} {ms:>8.3f}\n")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from Recursos import (
+    logger, recurso_dynamodb, cliente,
+    FACTURAS_COLA_BACKEND, FACTURAS_QUEUE_URL, ESTADO_TABLE_NAME
+)
+
+# Cola y registro de estados para la creación asíncrona de facturas.
+# Ambos son intercambiables: 'sqs' (SQS + DynamoDB) en AWS, 'memoria' para
+# pruebas locales con ServidorLocal.py. También pueden inyectarse con configurar().
+
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_COMPLETADA = 'completada'
+ESTADO_FALLIDA = 'fallida'
+
+# --- Colas ---
+class ColaSQS:
+    def __init__(self, queue_url, client=None):
+        self.queue_url = queue_url
+        self.client = client or cliente('sqs')
+        self._intentos = {}  # id_recepcion -> ApproximateReceiveCount del último lote
+
+    def enviar(self, mensaje):
+        self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(mensaje))
+
+    def recibir(self, maximo):
+        """Devuelve hasta `maximo` mensajes como lista de (id_recepcion, mensaje)"""
+        self._intentos = {}
+        mensajes = []
+        while len(mensajes) < maximo:
+            response = self.client.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=min(10, maximo - len(mensajes)),
+                AttributeNames=['ApproximateReceiveCount'],
+                WaitTimeSeconds=0
+            )
+            lote = response.get('Messages', [])
+            if not lote:
+                break
+            for m in lote:
+                self._intentos[m['ReceiptHandle']] = int(m.get('Attributes', {}).get('ApproximateReceiveCount', 1))
+                mensajes.append((m['ReceiptHandle'], json.loads(m['Body'])))
+        return mensajes
+
+    def intentos(self, id_recepcion):
+        """Cuántas veces se ha recibido el mensaje, contando la recepción actual"""
+        return self._intentos.get(id_recepcion, 1)
+
+    def confirmar(self, ids_recepcion):
+        ids_recepcion = list(ids_recepcion)
+        for id_recepcion in ids_recepcion:
+            self._intentos.pop(id_recepcion, None)
+        for i in range(0, len(ids_recepcion), 10):
+            self.client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{'Id': str(n), 'ReceiptHandle': h} for n, h in enumerate(ids_recepcion[i:i + 10])]
+            )
+
+class ColaMemoria:
+    """Imita la semántica de SQS: los mensajes recibidos quedan en vuelo y, si no
+    se confirman antes de `visibilidad` segundos, vuelven a la cola."""
+    def __init__(self, visibilidad=30.0):
+        self.visibilidad = visibilidad
+        self._mensajes = deque()  # [mensaje, intentos]
+        self._en_vuelo = {}  # id_recepcion -> (vence, [mensaje, intentos])
+        self._lock = threading.Lock()
+
+    def enviar(self, mensaje):
+        with self._lock:
+            self._mensajes.append([json.loads(json.dumps(mensaje)), 0])
+
+    def _restaurar_vencidos(self):
+        ahora = time.monotonic()
+        for id_recepcion, (vence, entrada) in list(self._en_vuelo.items()):
+            if vence <= ahora:
+                del self._en_vuelo[id_recepcion]
+                self._mensajes.append(entrada)
+
+    def recibir(self, maximo):
+        with self._lock:
+            self._restaurar_vencidos()
+            recibidos = []
+            while self._mensajes and len(recibidos) < maximo:
+                id_recepcion = str(uuid.uuid4())
+                entrada = self._mensajes.popleft()
+                entrada[1] += 1
+                self._en_vuelo[id_recepcion] = (time.monotonic() + self.visibilidad, entrada)
+                recibidos.append((id_recepcion, entrada[0]))
+            return recibidos
+
+    def intentos(self, id_recepcion):
+        """Cuántas veces se ha recibido el mensaje, contando la recepción actual"""
+        with self._lock:
+            _, entrada = self._en_vuelo.get(id_recepcion, (None, [None, 1]))
+            return entrada[1]
+
+    def confirmar(self, ids_recepcion):
+        with self._lock:
+            for id_recepcion in ids_recepcion:
+                self._en_vuelo.pop(id_recepcion, None)
+
+    def __len__(self):
+        """Mensajes visibles más mensajes en vuelo"""
+        with self._lock:
+            return len(self._mensajes) + len(self._en_vuelo)
+
+# --- Registro de estados ---
+class EstadosDynamoDB:
+    def __init__(self, table_name):
+        self.table = recurso_dynamodb().Table(table_name)
+
+    def registrar(self, tenant_id, factura_id, estado, error=None):
+        self.table.put_item(Item=_registro_estado(tenant_id, factura_id, estado, error))
+
+    def registrar_lote(self, registros):
+        """registros: lista de dicts con tenant_id, factura_id, estado y error opcional"""
+        # overwrite_by_pkeys: SQS puede entregar el mismo mensaje dos veces en un lote
+        with self.table.batch_writer(overwrite_by_pkeys=['tenant_id', 'factura_id']) as batch:
+            for r in registros:
+                batch.put_item(Item=_registro_estado(r['tenant_id'], r['factura_id'], r['estado'], r.get('error')))
+
+    def obtener(self, tenant_id, factura_id):
+        response = self.table.get_item(Key={'tenant_id': tenant_id, 'factura_id': factura_id})
+        return response.get('Item')
+
+class EstadosMemoria:
+    def __init__(self):
+        self._estados = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, tenant_id, factura_id, estado, error=None):
+        with self._lock:
+            self._estados[(tenant_id, factura_id)] = _registro_estado(tenant_id, factura_id, estado, error)
+
+    def registrar_lote(self, registros):
+        for r in registros:
+            self.registrar(r['tenant_id'], r['factura_id'], r['estado'], r.get('error'))
+
+    def obtener(self, tenant_id, factura_id):
+        return self._estados.get((tenant_id, factura_id))
+
+def _registro_estado(tenant_id, factura_id, estado, error=None):
+    registro = {
+        'tenant_id': tenant_id,
+        'factura_id': factura_id,
+        'estado': estado,
+        'fecha_actualizacion': datetime.utcnow().isoformat()
+    }
+    if error:
+        registro['error'] = error
+    return registro
+
+# --- Instancias compartidas por contenedor ---
+_cola = None
+_estados = None
+
+def configurar(cola=None, estados=None):
+    """Reemplaza la cola y/o el registro de estados (p. ej. por versiones en memoria)"""
+    global _cola, _estados
+    if cola is not None:
+        _cola = cola
+    if estados is not None:
+        _estados = estados
+
+def obtener_cola():
+    global _cola
+    if _cola is None:
+        if FACTURAS_COLA_BACKEND == 'memoria':
+            _cola = ColaMemoria()
+        else:
+            if not FACTURAS_QUEUE_URL:
+                logger.warning("FACTURAS_QUEUE_URL no está configurada.")
+            _cola = ColaSQS(FACTURAS_QUEUE_URL)
+    return _cola
+
+def obtener_estados():
+    global _estados
+    if _estados is None:
+        _estados = EstadosMemoria() if FACTURAS_COLA_BACKEND == 'memoria' else EstadosDynamoDB(ESTADO_TABLE_NAME)
+    return _estados
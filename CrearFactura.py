@@ -1,49 +1,44 @@
 import json
-import boto3
 from datetime import datetime
 import uuid
-import urllib3
-import os
-import logging
 from decimal import Decimal
 
-# --- Configuración Inicial ---
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-try:
-    dynamodb_resource = boto3.resource('dynamodb')
-    s3_client = boto3.client('s3')
-    http = urllib3.PoolManager()
-    glue_client = boto3.client('glue') 
-    # ## --- NUEVA LÍNEA: Cliente de AWS Lambda para invocación --- ##
-    lambda_client = boto3.client('lambda') 
-except Exception as e:
-    logger.error(f"Error inicializando clientes de AWS: {str(e)}")
-    raise e
-
-DYNAMODB_TABLE_NAME = 'facturas-api-dev'
-S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', 'pf-facturas-sergio')
-USUARIO_LAMBDA_URL = 'https://30ipk5jpl6.execute-api.us-east-1.amazonaws.com/dev/usuarios/obtener'
-PRODUCTO_LAMBDA_URL = 'https://1kobbmlfu9.execute-api.us-east-1.amazonaws.com/dev/productos/obtener'
-# ## --- NUEVA VARIABLE: Nombre de la Lambda a invocar --- ##
-ATHENA_REPAIR_LAMBDA_NAME = os.environ.get('ATHENA_REPAIR_LAMBDA_NAME', 'AthenaRepairTableFacturas')
-
-# --- Funciones de Ayuda (sin cambios) ---
+# --- Configuración Inicial (clientes y constantes compartidos, ver Recursos.py) ---
+from Recursos import (
+    logger, tabla_facturas, cliente, http_pool,
+    S3_BUCKET_NAME, USUARIO_LAMBDA_URL, PRODUCTO_LAMBDA_URL, ATHENA_REPAIR_LAMBDA_NAME
+)
+from Respuestas import con_evento_decodificado
+
+# Particiones de Glue ya verificadas en este contenedor (caché en caliente)
+particiones_glue_conocidas = set()
+
+class ErrorServicioExterno(Exception):
+    """Fallo transitorio (red, timeout, 429 o 5xx) al consultar un servicio externo"""
+
+# --- Funciones de Ayuda ---
 def obtener_datos_externos(url, method='POST', data=None):
+    """Devuelve el JSON de la respuesta, None si el recurso no existe (404 u otro 4xx)
+    o lanza ErrorServicioExterno si el fallo es transitorio y vale la pena reintentar."""
     try:
         headers = {'Content-Type': 'application/json'}
         encoded_data = json.dumps(data).encode('utf-8') if data else None
-        response = http.request(method, url, body=encoded_data, headers=headers, timeout=10.0)
-        logger.info(f"Respuesta de {url}: Status {response.status}")
-        if response.status == 200:
-            return json.loads(response.data.decode('utf-8'))
-        else:
-            logger.warning(f"Error en llamada a {url}: Status {response.status}, Body: {response.data.decode('utf-8')}")
-            return None
+        response = http_pool().request(method, url, body=encoded_data, headers=headers, timeout=10.0)
     except Exception as e:
         logger.error(f"Excepción al llamar a {url}: {str(e)}")
-        return None
+        raise ErrorServicioExterno(f"Excepción al llamar a {url}: {str(e)}")
+
+    logger.info(f"Respuesta de {url}: Status {response.status}")
+    if response.status == 200:
+        try:
+            return json.loads(response.data.decode('utf-8'))
+        except ValueError as e:
+            logger.warning(f"Respuesta no JSON de {url}: {str(e)}")
+            return None
+    logger.warning(f"Error en llamada a {url}: Status {response.status}, Body: {response.data.decode('utf-8', 'replace')}")
+    if response.status == 429 or response.status >= 500:
+        raise ErrorServicioExterno(f"Status {response.status} de {url}")
+    return None
 
 def convert_floats_to_decimals(obj):
     if isinstance(obj, float): return Decimal(str(obj))
@@ -58,6 +53,9 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(obj)
 
 def add_partition_to_glue(tenant_id, fecha, bucket_name, table_name="pf_facturas_sergio", database_name="facturas_db"):
+    if (table_name, tenant_id, fecha) in particiones_glue_conocidas:
+        return
+    glue_client = cliente('glue')
     try:
         partition_location = f"s3://{bucket_name}/{tenant_id}/facturas/{fecha}/"
         partition_values = [tenant_id, fecha] 
@@ -73,38 +71,167 @@ def add_partition_to_glue(tenant_id, fecha, bucket_name, table_name="pf_facturas
                 PartitionInput={'Values': partition_values, 'StorageDescriptor': {'Location': partition_location, 'SerdeInfo': {'SerializationLibrary': 'org.openx.data.jsonserde.JsonSerDe', 'Parameters': {'ignore.malformed.json': 'true'}}, 'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat', 'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat'}}
             )
             logger.info(f"Partición {partition_values} creada exitosamente en Glue para {table_name}.")
+        particiones_glue_conocidas.add((table_name, tenant_id, fecha))
     except Exception as e:
         logger.error(f"Error al añadir/verificar partición en Glue para {tenant_id}/{fecha}: {str(e)}", exc_info=True)
 
 
+# --- Pasos reutilizables (flujo síncrono y worker asíncrono) ---
+def obtener_usuario(tenant_id, usuario_id):
+    """Consulta el servicio de usuarios. Devuelve el usuario o None si no existe"""
+    usuario_info_respuesta = obtener_datos_externos(USUARIO_LAMBDA_URL, data={'tenant_id': tenant_id, 'id': usuario_id})
+    if not (usuario_info_respuesta and 'user' in usuario_info_respuesta):
+        return None
+
+    usuario_info = usuario_info_respuesta['user']
+    logger.info(f"Usuario {usuario_id} encontrado: {usuario_info.get('nombres')}")
+
+    if 'direccion' in usuario_info and isinstance(usuario_info['direccion'], str):
+        try:
+            logger.info(f"Detectado campo 'direccion' como string. Intentando deserializar: {usuario_info['direccion']}")
+            usuario_info['direccion'] = json.loads(usuario_info['direccion'])
+            logger.info("El campo 'direccion' ha sido deserializado a un objeto struct correctamente.")
+        except json.JSONDecodeError:
+            logger.warning("El campo 'direccion' no era un JSON válido. Se establecerá como nulo.")
+            usuario_info['direccion'] = None
+    return usuario_info
+
+def obtener_producto(tenant_id, prod_id):
+    """Consulta el servicio de productos. Devuelve el producto o None si no existe"""
+    logger.info(f"Obteniendo datos para producto: {prod_id}")
+    producto_info_respuesta = obtener_datos_externos(f"{PRODUCTO_LAMBDA_URL}?tenant_id={tenant_id}&id_producto={prod_id}", method='GET')
+    if not (producto_info_respuesta and 'product' in producto_info_respuesta):
+        return None
+    producto_real = producto_info_respuesta['product']
+    logger.info(f"Producto {prod_id} encontrado: {producto_real.get('nombre')}")
+    return producto_real
+
+def validar_solicitud(body):
+    """Devuelve un mensaje de error si faltan campos obligatorios, o None"""
+    if not all([body.get('tenant_id'), body.get('usuario_id'), body.get('productos')]):
+        return "Faltan campos: 'tenant_id', 'usuario_id', 'productos'."
+    return None
+
+def validar_solicitud_estricta(body):
+    """Como validar_solicitud, pero además valida los tipos. Se usa antes de
+    encolar, donde un error ya no puede devolverse al cliente."""
+    if not isinstance(body, dict):
+        return "El body debe ser un objeto JSON."
+    error_validacion = validar_solicitud(body)
+    if error_validacion:
+        return error_validacion
+    if not isinstance(body['tenant_id'], str) or not isinstance(body['usuario_id'], str):
+        return "'tenant_id' y 'usuario_id' deben ser strings."
+    productos = body['productos']
+    if not isinstance(productos, list):
+        return "'productos' debe ser una lista no vacía."
+    for prod_req in productos:
+        if not isinstance(prod_req, dict) or not prod_req.get('id'):
+            return "Cada producto debe ser un objeto con 'id'."
+        if isinstance(prod_req['id'], bool) or not isinstance(prod_req['id'], (str, int)):
+            return "El 'id' de cada producto debe ser un string o un entero."
+        cantidad = prod_req.get('cantidad', 1)
+        if isinstance(cantidad, bool) or not isinstance(cantidad, int) or cantidad <= 0:
+            return f"La cantidad del producto '{prod_req['id']}' debe ser un entero positivo."
+    return None
+
+def construir_factura(tenant_id, usuario_id, productos_req, factura_id=None, fecha_actual=None,
+                      buscar_usuario=obtener_usuario, buscar_producto=obtener_producto):
+    """Enriquece la solicitud con los servicios externos y arma la factura final.
+    Devuelve (factura, None) o (None, mensaje_de_error) si el usuario o un producto no existen.
+    Los fallos transitorios de los servicios se propagan como ErrorServicioExterno."""
+    usuario_info = buscar_usuario(tenant_id, usuario_id)
+    if usuario_info is None:
+        return None, f"Usuario con ID '{usuario_id}' no encontrado para el tenant '{tenant_id}'."
+
+    total_factura = Decimal('0.0')
+    productos_procesados = []
+
+    for prod_req in productos_req:
+        prod_id = prod_req.get('id')
+        cantidad = prod_req.get('cantidad', 1)
+
+        producto_real = buscar_producto(tenant_id, prod_id)
+        if producto_real is None:
+            return None, f"Producto con ID '{prod_id}' no encontrado para el tenant '{tenant_id}'."
+
+        precio_str = producto_real.get('precio', '0')
+        precio_unitario = Decimal(precio_str)
+        subtotal = precio_unitario * Decimal(cantidad)
+        total_factura += subtotal
+
+        productos_procesados.append({
+            'id_prod': prod_id,
+            'nombre': producto_real.get('nombre', 'Producto sin nombre'),
+            'precio_unitario': precio_unitario,
+            'cantidad': cantidad,
+            'subtotal': subtotal
+        })
+
+    factura_id = factura_id or str(uuid.uuid4())
+    fecha_actual = fecha_actual or datetime.utcnow()
+
+    factura_final = {
+        'factura_id': factura_id,
+        'tenant_id': tenant_id,
+        'fecha': fecha_actual.strftime('%Y-%m-%d'),
+        'fecha_creacion': fecha_actual.isoformat(),
+        'usuario_info': usuario_info,
+        'productos': productos_procesados,
+        'total': total_factura,
+        'estado': 'activa',
+        'productos_fallidos': []
+    }
+    return factura_final, None
+
+def s3_key_factura(factura):
+    return f"{factura['tenant_id']}/facturas/{factura['fecha']}/{factura['factura_id']}.json"
+
+def archivar_en_s3(factura):
+    s3_key = s3_key_factura(factura)
+    cliente('s3').put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=json.dumps(factura, cls=DecimalEncoder, ensure_ascii=False), ContentType="application/json")
+    logger.info(f"Archivado en S3 exitoso en la ruta: s3://{S3_BUCKET_NAME}/{s3_key}")
+
+def invocar_reparacion_athena(payload):
+    try:
+        if ATHENA_REPAIR_LAMBDA_NAME:
+            cliente('lambda').invoke(
+                FunctionName=ATHENA_REPAIR_LAMBDA_NAME,
+                InvocationType='Event',
+                Payload=json.dumps(payload)
+            )
+            logger.info(f"Lambda {ATHENA_REPAIR_LAMBDA_NAME} invocada exitosamente de forma asíncrona: {payload}.")
+        else:
+            logger.warning("ATHENA_REPAIR_LAMBDA_NAME no está configurada. No se invocará la Lambda de reparación.")
+    except Exception as e:
+        logger.error(f"Error al invocar la Lambda {ATHENA_REPAIR_LAMBDA_NAME}: {str(e)}", exc_info=True)
+
+
 # --- Handler Principal de la Lambda ---
+@con_evento_decodificado
 def lambda_handler(event, context):
     logger.info(f"Iniciando lambda 'crear_factura_completa'. Request ID: {context.aws_request_id}")
 
     try:
         # --- 1. Parsear y Validar Input ---
         body = json.loads(event.get('body', '{}'))
-        tenant_id = body.get('tenant_id')
-        usuario_id = body.get('usuario_id')
-        productos_req = body.get('productos')
+        error_validacion = validar_solicitud(body)
 
-        if not all([tenant_id, usuario_id, productos_req]):
+        if error_validacion:
             return {
                 "statusCode": 400,
                 "headers": {
                     "Content-Type": "application/json",
                     "Access-Control-Allow-Origin": "*"
                 },
-                "body": json.dumps({"error": "Faltan campos: 'tenant_id', 'usuario_id', 'productos'."})
+                "body": json.dumps({"error": error_validacion})
             }
-        
-        # --- 2. Enriquecer y Validar Datos Estrictamente ---
+
+        # --- 2 y 3. Enriquecer, Validar y Ensamblar la Factura ---
         logger.info("Paso 2: Enriqueciendo y validando datos desde servicios externos.")
-        
-        usuario_info_respuesta = obtener_datos_externos(USUARIO_LAMBDA_URL, data={'tenant_id': tenant_id, 'id': usuario_id})
+        factura_final, error_msg = construir_factura(body['tenant_id'], body['usuario_id'], body['productos'])
 
-        if not (usuario_info_respuesta and 'user' in usuario_info_respuesta):
-            error_msg = f"Usuario con ID '{usuario_id}' no encontrado para el tenant '{tenant_id}'."
+        if error_msg:
             logger.error(error_msg)
             return {
                 "statusCode": 404,
@@ -114,104 +241,23 @@ def lambda_handler(event, context):
                 },
                 "body": json.dumps({"error": error_msg})
             }
-        
-        usuario_info = usuario_info_respuesta['user']
-        logger.info(f"Usuario {usuario_id} encontrado: {usuario_info.get('nombres')}")
-
-        if 'direccion' in usuario_info and isinstance(usuario_info['direccion'], str):
-            try:
-                logger.info(f"Detectado campo 'direccion' como string. Intentando deserializar: {usuario_info['direccion']}")
-                usuario_info['direccion'] = json.loads(usuario_info['direccion'])
-                logger.info("El campo 'direccion' ha sido deserializado a un objeto struct correctamente.")
-            except json.JSONDecodeError:
-                logger.warning("El campo 'direccion' no era un JSON válido. Se establecerá como nulo.")
-                usuario_info['direccion'] = None
-        
-        total_factura = Decimal('0.0')
-        productos_procesados = []
-
-        for prod_req in productos_req:
-            prod_id = prod_req.get('id')
-            cantidad = prod_req.get('cantidad', 1)
-            
-            logger.info(f"Obteniendo datos para producto: {prod_id}")
-            producto_info_respuesta = obtener_datos_externos(f"{PRODUCTO_LAMBDA_URL}?tenant_id={tenant_id}&id_producto={prod_id}", method='GET')
-            
-            if not (producto_info_respuesta and 'product' in producto_info_respuesta):
-                error_msg = f"Producto con ID '{prod_id}' no encontrado para el tenant '{tenant_id}'."
-                logger.error(error_msg)
-                return {
-                    "statusCode": 404,
-                    "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*"
-                    },
-                    "body": json.dumps({"error": error_msg})
-                }
-
-            producto_real = producto_info_respuesta['product']
-            logger.info(f"Producto {prod_id} encontrado: {producto_real.get('nombre')}")
-            
-            precio_str = producto_real.get('precio', '0')
-            precio_unitario = Decimal(precio_str)
-            subtotal = precio_unitario * Decimal(cantidad)
-            total_factura += subtotal
-            
-            productos_procesados.append({
-                'id_prod': prod_id,
-                'nombre': producto_real.get('nombre', 'Producto sin nombre'),
-                'precio_unitario': precio_unitario,
-                'cantidad': cantidad,
-                'subtotal': subtotal
-            })
-
-        # --- 3. Ensamblar el Objeto Final de la Factura ---
-        logger.info("Paso 3: Ensamblando objeto final de la factura.")
-        
-        factura_id = str(uuid.uuid4())
-        fecha_actual = datetime.utcnow()
-
-        factura_final = {
-            'factura_id': factura_id,
-            'tenant_id': tenant_id,
-            'fecha': fecha_actual.strftime('%Y-%m-%d'),
-            'fecha_creacion': fecha_actual.isoformat(),
-            'usuario_info': usuario_info,
-            'productos': productos_procesados,
-            'total': total_factura,
-            'estado': 'activa',
-            'productos_fallidos': []
-        }
-        
+
+        factura_id = factura_final['factura_id']
+        tenant_id = factura_final['tenant_id']
         factura_dynamodb = convert_floats_to_decimals(factura_final)
-        
+
         # --- 4. Guardar en DynamoDB ---
         logger.info(f"Paso 4: Guardando factura {factura_id} en DynamoDB.")
-        table = dynamodb_resource.Table(DYNAMODB_TABLE_NAME)
-        table.put_item(Item=factura_dynamodb)
+        tabla_facturas().put_item(Item=factura_dynamodb)
         logger.info("Guardado en DynamoDB exitoso.")
 
         # --- 5. Archivando en S3 ---
         logger.info(f"Paso 5: Archivando factura {factura_id} en S3.")
-        s3_key = f"{tenant_id}/facturas/{factura_final['fecha']}/{factura_id}.json"
-        s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=json.dumps(factura_final, cls=DecimalEncoder, ensure_ascii=False), ContentType="application/json")
-        logger.info(f"Archivado en S3 exitoso en la ruta: s3://{S3_BUCKET_NAME}/{s3_key}")
+        archivar_en_s3(factura_final)
 
-        add_partition_to_glue(tenant_id, factura_final['fecha'], S3_BUCKET_NAME) 
+        add_partition_to_glue(tenant_id, factura_final['fecha'], S3_BUCKET_NAME)
 
-        # ## --- NUEVA LÓGICA: Invocar la Lambda de reparación de Athena --- ##
-        try:
-            if ATHENA_REPAIR_LAMBDA_NAME:
-                lambda_client.invoke(
-                    FunctionName=ATHENA_REPAIR_LAMBDA_NAME,
-                    InvocationType='Event',
-                    Payload=json.dumps({"detail": "new_invoice_created", "factura_id": factura_id})
-                )
-                logger.info(f"Lambda {ATHENA_REPAIR_LAMBDA_NAME} invocada exitosamente de forma asíncrona para factura {factura_id}.")
-            else:
-                logger.warning("ATHENA_REPAIR_LAMBDA_NAME no está configurada. No se invocará la Lambda de reparación.")
-        except Exception as e:
-            logger.error(f"Error al invocar la Lambda {ATHENA_REPAIR_LAMBDA_NAME}: {str(e)}", exc_info=True)
+        invocar_reparacion_athena({"detail": "new_invoice_created", "factura_id": factura_id})
 
         logger.info("Proceso completado.")
         return {
@@ -223,6 +269,16 @@ def lambda_handler(event, context):
             'body': json.dumps({'mensaje': 'Factura creada, enriquecida y archivada exitosamente', 'factura': factura_final}, cls=DecimalEncoder, indent=2)
         }
 
+    except ErrorServicioExterno as e:
+        logger.error(f"Servicio externo no disponible: {str(e)}")
+        return {
+            "statusCode": 502,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*"
+            },
+            "body": json.dumps({"error": "Servicio externo no disponible, intente nuevamente."})
+        }
     except json.JSONDecodeError as e:
         logger.error(f"Error de parseo JSON: {str(e)}")
         return {
@@ -0,0 +1,103 @@
+import json
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode
+
+from Recursos import logger
+from CrearFactura import validar_solicitud_estricta
+import ColaFacturas
+from Respuestas import con_evento_decodificado
+
+def url_estado(event, tenant_id, factura_id):
+    """URL del endpoint de estado; absoluta si el evento trae dominio de API Gateway"""
+    ruta = '/factura/estado?' + urlencode({'tenant_id': tenant_id, 'factura_id': factura_id})
+    request_context = event.get('requestContext') or {}
+    dominio = request_context.get('domainName')
+    if not dominio:
+        return ruta
+    stage = request_context.get('stage')
+    if stage and stage != '$default':
+        ruta = f"/{stage}{ruta}"
+    return f"https://{dominio}{ruta}"
+
+# --- Handler: valida, asigna factura_id, encola y responde 202 ---
+@con_evento_decodificado
+def lambda_handler(event, context):
+    logger.info(f"Iniciando lambda 'crear_factura_async'. Request ID: {context.aws_request_id}")
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+        error_validacion = validar_solicitud_estricta(body)
+
+        if error_validacion:
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*"
+                },
+                "body": json.dumps({"error": error_validacion})
+            }
+
+        tenant_id = body['tenant_id']
+        factura_id = str(uuid.uuid4())
+        mensaje = {
+            'factura_id': factura_id,
+            'tenant_id': tenant_id,
+            'usuario_id': body['usuario_id'],
+            'productos': body['productos'],
+            'fecha_solicitud': datetime.utcnow().isoformat()
+        }
+
+        # El estado se registra antes de encolar para que el worker nunca lo adelante
+        estados = ColaFacturas.obtener_estados()
+        estados.registrar(tenant_id, factura_id, ColaFacturas.ESTADO_PENDIENTE)
+        try:
+            ColaFacturas.obtener_cola().enviar(mensaje)
+        except Exception as e:
+            # Sin mensaje en la cola nadie resolvería el estado 'pendiente'
+            logger.error(f"Error al encolar la factura {factura_id}: {str(e)}", exc_info=True)
+            try:
+                estados.registrar(tenant_id, factura_id, ColaFacturas.ESTADO_FALLIDA, 'No se pudo encolar la solicitud.')
+            except Exception as e2:
+                logger.error(f"Error al marcar como fallida la factura {factura_id}: {str(e2)}", exc_info=True)
+            raise
+        logger.info(f"Factura {factura_id} encolada para creación asíncrona.")
+
+        estado_url = url_estado(event, tenant_id, factura_id)
+        return {
+            'statusCode': 202,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Location': estado_url
+            },
+            'body': json.dumps({
+                'mensaje': 'Factura recibida, se procesará de forma asíncrona',
+                'factura_id': factura_id,
+                'tenant_id': tenant_id,
+                'estado': ColaFacturas.ESTADO_PENDIENTE,
+                'estado_url': estado_url
+            }, indent=2, ensure_ascii=False)
+        }
+
+    except json.JSONDecodeError as e:
+        logger.error(f"Error de parseo JSON: {str(e)}")
+        return {
+            "statusCode": 400,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*"
+            },
+            "body": json.dumps({"error": "Cuerpo de la petición no es un JSON válido."})
+        }
+    except Exception as e:
+        logger.error(f"Error inesperado durante la ejecución: {str(e)}", exc_info=True)
+        return {
+            "statusCode": 500,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*"
+            },
+            "body": json.dumps({"error": "Ocurrió un error interno en el servidor."})
+        }
@@ -1,17 +1,16 @@
 
 import json
-import boto3
 
-# Cliente de DynamoDB
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('Facturas')
+# Cliente de DynamoDB compartido (ver Recursos.py)
+from Recursos import tabla_facturas
+from Respuestas import con_evento_decodificado
 
 def eliminar_factura(factura_id, tenant_id):
     """Elimina una factura específica"""
     try:
         
         # Verificar que la factura existe antes de eliminar
-        response = table.get_item(
+        response = tabla_facturas().get_item(
             Key={
                 'tenant_id': tenant_id,
                 'factura_id': factura_id
@@ -22,7 +21,7 @@ def eliminar_factura(factura_id, tenant_id):
             return {'error': 'Factura no encontrada'}
         
         # Eliminar la factura
-        table.delete_item(
+        tabla_facturas().delete_item(
             Key={
                 'tenant_id': tenant_id,
                 'factura_id': factura_id
@@ -33,6 +32,7 @@ def eliminar_factura(factura_id, tenant_id):
     except Exception as e:
         return {'error': f"Error al eliminar factura: {str(e)}"}
 
+@con_evento_decodificado
 def lambda_handler(event, context):
     try:
         # Parseo robusto del body
@@ -0,0 +1,69 @@
+import json
+
+import ColaFacturas
+from Respuestas import con_evento_decodificado
+
+@con_evento_decodificado
+def lambda_handler(event, context):
+    try:
+        # Acepta GET con query string (URL devuelta por CrearFacturaAsync) o POST con body
+        parametros = event.get('queryStringParameters') or {}
+        body = event.get('body')
+        if not parametros and isinstance(body, str) and body.strip():
+            try:
+                parametros = json.loads(body)
+            except Exception as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({
+                        'error': 'El body del request no es JSON válido',
+                        'detalle': str(e)
+                    }, indent=2, ensure_ascii=False)
+                }
+        tenant_id = parametros['tenant_id']
+        factura_id = parametros['factura_id']
+
+        registro = ColaFacturas.obtener_estados().obtener(tenant_id, factura_id)
+        if not registro:
+            return {
+                'statusCode': 404,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'error': 'Solicitud no encontrada',
+                    'detalle': 'No existe una solicitud de factura con el ID y tenant proporcionados.'
+                }, indent=2, ensure_ascii=False)
+            }
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps(registro, indent=2, ensure_ascii=False, default=str)
+        }
+
+    except KeyError as e:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f'Campo requerido faltante: {str(e)}'}, indent=2, ensure_ascii=False)
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f"Error al obtener el estado de la factura: {str(e)}"}, indent=2, ensure_ascii=False)
+        }
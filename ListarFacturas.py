@@ -1,15 +1,14 @@
 import json
-import boto3
 
-# Cliente de DynamoDB
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('facturas-api-dev')
+# Cliente de DynamoDB compartido (ver Recursos.py)
+from Recursos import tabla_facturas
+from Respuestas import con_evento_decodificado, comprimir_respuesta
 
 def obtener_facturas(tenant_id, skip=0, limit=10, usuario_id=None):
     """Obtiene facturas de DynamoDB con paginación y filtros"""
     try:
         # Obtener todas las facturas del tenant
-        response = table.query(
+        response = tabla_facturas().query(
             KeyConditionExpression='tenant_id = :tenant_id',
             ExpressionAttributeValues={
                 ':tenant_id': tenant_id
@@ -27,6 +26,7 @@ def obtener_facturas(tenant_id, skip=0, limit=10, usuario_id=None):
     except Exception as e:
         return {'error': f"Error al obtener facturas: {str(e)}"}
 
+@con_evento_decodificado
 def lambda_handler(event, context):
     try:
         # Parseo robusto del body
@@ -85,7 +85,7 @@ def lambda_handler(event, context):
                     'detalle': 'No existen facturas para los filtros proporcionados.'
                 }, indent=2, ensure_ascii=False)
             }
-        return {
+        return comprimir_respuesta(event, {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
@@ -96,7 +96,7 @@ def lambda_handler(event, context):
                 'cantidad': len(facturas),
                 'facturas': facturas
             }, indent=2, ensure_ascii=False, default=str)
-        }
+        })
 
     except KeyError as e:
         return {
@@ -1,15 +1,14 @@
 import json
-import boto3
 
-# Cliente de DynamoDB
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('Facturas')
+# Cliente de DynamoDB compartido (ver Recursos.py)
+from Recursos import tabla_facturas
+from Respuestas import con_evento_decodificado, comprimir_respuesta
 
 def obtener_factura_por_id(factura_id, tenant_id):
     """Obtiene una factura específica por ID"""
     try:
         
-        response = table.get_item(
+        response = tabla_facturas().get_item(
             Key={
                 'tenant_id': tenant_id,
                 'factura_id': factura_id
@@ -23,6 +22,7 @@ def obtener_factura_por_id(factura_id, tenant_id):
     except Exception as e:
         return {'error': f"Error al obtener factura: {str(e)}"}
 
+@con_evento_decodificado
 def lambda_handler(event, context):
     try:
         # Parseo robusto del body
@@ -67,7 +67,7 @@ def lambda_handler(event, context):
                     'detalle': 'No existe una factura con el ID y tenant proporcionados.'
                 }, indent=2, ensure_ascii=False)
             }
-        return {
+        return comprimir_respuesta(event, {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
@@ -77,7 +77,7 @@ def lambda_handler(event, context):
                 'mensaje': 'Factura encontrada correctamente',
                 'factura': factura
             }, indent=2, ensure_ascii=False, default=str)
-        }
+        })
 
     except KeyError as e:
         return {
@@ -0,0 +1,210 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Recursos import (
+    logger, tabla_facturas, S3_BUCKET_NAME, TAMANO_LOTE_FACTURAS, MAX_OPERACIONES_PARALELAS, FACTURAS_MAX_INTENTOS
+)
+from CrearFactura import (
+    ErrorServicioExterno, obtener_usuario, obtener_producto, validar_solicitud_estricta, construir_factura,
+    convert_floats_to_decimals, archivar_en_s3, add_partition_to_glue, invocar_reparacion_athena
+)
+import ColaFacturas
+
+# Marca de una consulta externa que falló de forma transitoria
+_FALLO_TRANSITORIO = object()
+
+def _en_paralelo(funcion, elementos):
+    """Aplica funcion a cada elemento con un pool de hilos, preservando el orden"""
+    elementos = list(elementos)
+    if not elementos:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_OPERACIONES_PARALELAS, len(elementos))) as executor:
+        return list(executor.map(funcion, elementos))
+
+def _consultar(funcion, claves):
+    """Consulta cada clave (tenant_id, id) una sola vez y devuelve {clave: resultado}"""
+    def consultar(clave):
+        try:
+            return funcion(*clave)
+        except ErrorServicioExterno:
+            return _FALLO_TRANSITORIO
+    claves = list(claves)
+    return dict(zip(claves, _en_paralelo(consultar, claves)))
+
+def _buscador(resultados):
+    """Adapta los resultados del lote a la firma que espera construir_factura"""
+    def buscar(tenant_id, id_recurso):
+        resultado = resultados.get((tenant_id, id_recurso))
+        if resultado is _FALLO_TRANSITORIO:
+            raise ErrorServicioExterno(f"La consulta de '{id_recurso}' falló de forma transitoria")
+        return resultado
+    return buscar
+
+def _archivar(factura):
+    try:
+        archivar_en_s3(factura)
+        return True
+    except Exception as e:
+        logger.error(f"Error archivando factura {factura['factura_id']} en S3: {str(e)}", exc_info=True)
+        return False
+
+def _estado(mensaje, estado, error=None):
+    return {'tenant_id': mensaje['tenant_id'], 'factura_id': mensaje['factura_id'], 'estado': estado, 'error': error}
+
+def procesar_lote(mensajes, intentos=None):
+    """Crea las facturas de un lote de mensajes [(id, mensaje), ...].
+    Cada mensaje se resuelve por separado: los inválidos o con usuario/producto
+    inexistente se marcan como fallidos sin reintento; los afectados por errores
+    transitorios (servicios externos, DynamoDB, S3) se devuelven para reintentarse,
+    salvo en su último intento (`intentos`: {id: recepciones} >= FACTURAS_MAX_INTENTOS),
+    en el que se marcan como fallidos antes de que la cola los envíe a la DLQ."""
+    intentos = intentos or {}
+    estados = ColaFacturas.obtener_estados()
+    registros_estado = []
+    fallos = []  # (id_mensaje, mensaje, error) a reintentar
+
+    # --- 1. Validar cada mensaje y reunir las claves a consultar ---
+    validos = []
+    claves_usuario = set()
+    claves_producto = set()
+    for id_mensaje, mensaje in mensajes:
+        if not (isinstance(mensaje, dict) and isinstance(mensaje.get('tenant_id'), str)
+                and isinstance(mensaje.get('factura_id'), str)):
+            logger.error(f"Mensaje {id_mensaje} descartado por formato inválido: {mensaje}")
+            continue
+        try:
+            error_validacion = validar_solicitud_estricta(mensaje)
+            if error_validacion:
+                registros_estado.append(_estado(mensaje, ColaFacturas.ESTADO_FALLIDA, error_validacion))
+                continue
+            claves_usuario_msg = {(mensaje['tenant_id'], mensaje['usuario_id'])}
+            claves_producto_msg = {(mensaje['tenant_id'], p['id']) for p in mensaje['productos']}
+        except Exception as e:
+            logger.error(f"Mensaje {id_mensaje} inválido: {str(e)}")
+            registros_estado.append(_estado(mensaje, ColaFacturas.ESTADO_FALLIDA, f"Solicitud inválida: {str(e)}"))
+            continue
+        claves_usuario |= claves_usuario_msg
+        claves_producto |= claves_producto_msg
+        validos.append((id_mensaje, mensaje))
+
+    # --- 2. Consultas externas deduplicadas en todo el lote ---
+    logger.info(f"Lote de {len(validos)} facturas: {len(claves_usuario)} usuarios y {len(claves_producto)} productos distintos.")
+    buscar_usuario = _buscador(_consultar(obtener_usuario, claves_usuario))
+    buscar_producto = _buscador(_consultar(obtener_producto, claves_producto))
+
+    # --- 3. Ensamblar facturas ---
+    facturas = []
+    for id_mensaje, mensaje in validos:
+        try:
+            factura, error_msg = construir_factura(
+                mensaje['tenant_id'], mensaje['usuario_id'], mensaje['productos'],
+                factura_id=mensaje['factura_id'],
+                buscar_usuario=buscar_usuario,
+                buscar_producto=buscar_producto
+            )
+        except ErrorServicioExterno as e:
+            logger.warning(f"Factura {mensaje['factura_id']} con error transitorio: {str(e)}")
+            fallos.append((id_mensaje, mensaje, str(e)))
+            continue
+        except Exception as e:
+            logger.error(f"Error ensamblando factura {mensaje['factura_id']}: {str(e)}", exc_info=True)
+            registros_estado.append(_estado(mensaje, ColaFacturas.ESTADO_FALLIDA, f"Solicitud inválida: {str(e)}"))
+            continue
+        if error_msg:
+            logger.error(f"Factura {mensaje['factura_id']}: {error_msg}")
+            registros_estado.append(_estado(mensaje, ColaFacturas.ESTADO_FALLIDA, error_msg))
+            continue
+        facturas.append((id_mensaje, factura))
+
+    # --- 4. Guardar en DynamoDB por lotes ---
+    if facturas:
+        try:
+            # overwrite_by_pkeys: SQS puede entregar el mismo mensaje dos veces en un lote
+            with tabla_facturas().batch_writer(overwrite_by_pkeys=['tenant_id', 'factura_id']) as batch:
+                for _, factura in facturas:
+                    batch.put_item(Item=convert_floats_to_decimals(factura))
+            logger.info(f"Guardadas {len(facturas)} facturas en DynamoDB.")
+        except Exception as e:
+            # El factura_id viene en el mensaje, por lo que reintentar el lote es idempotente
+            logger.error(f"Error guardando lote en DynamoDB: {str(e)}", exc_info=True)
+            fallos.extend((id_mensaje, factura, f"Error guardando en DynamoDB: {str(e)}") for id_mensaje, factura in facturas)
+            facturas = []
+
+    # --- 5. Archivar en S3 en paralelo ---
+    archivadas = _en_paralelo(_archivar, [factura for _, factura in facturas])
+    creadas = []
+    for (id_mensaje, factura), ok in zip(facturas, archivadas):
+        if not ok:
+            fallos.append((id_mensaje, factura, "Error archivando en S3"))
+            continue
+        creadas.append(factura)
+        registros_estado.append(_estado(factura, ColaFacturas.ESTADO_COMPLETADA))
+
+    # --- 6. Particiones de Glue y reparación de Athena, una vez por lote ---
+    for tenant_id, fecha in {(f['tenant_id'], f['fecha']) for f in creadas}:
+        add_partition_to_glue(tenant_id, fecha, S3_BUCKET_NAME)
+    if creadas:
+        # Mismo payload que el flujo síncrono; 'factura_ids' agrega el resto del lote
+        invocar_reparacion_athena({"detail": "new_invoice_created", "factura_id": creadas[0]['factura_id'],
+                                   "factura_ids": [f['factura_id'] for f in creadas]})
+
+    # --- 7. Reintentar o, en el último intento, marcar como fallidos ---
+    reintentar = []
+    for id_mensaje, mensaje, error in fallos:
+        if intentos.get(id_mensaje, 1) >= FACTURAS_MAX_INTENTOS:
+            logger.error(f"Factura {mensaje['factura_id']} agotó sus {FACTURAS_MAX_INTENTOS} intentos: {error}")
+            registros_estado.append(_estado(mensaje, ColaFacturas.ESTADO_FALLIDA, f"Reintentos agotados: {error}"))
+        else:
+            reintentar.append(id_mensaje)
+
+    if registros_estado:
+        estados.registrar_lote(registros_estado)
+    fallidas = sum(1 for r in registros_estado if r['estado'] == ColaFacturas.ESTADO_FALLIDA)
+    logger.info(f"Lote procesado: {len(creadas)} creadas, {fallidas} fallidas, {len(reintentar)} a reintentar.")
+    return reintentar
+
+def drenar_cola(cola=None, tamano_lote=TAMANO_LOTE_FACTURAS, max_lotes=None):
+    """Consume la cola en lotes de hasta `tamano_lote` mensajes hasta vaciarla.
+    Los mensajes a reintentar no se confirman: la cola (SQS o ColaMemoria) los
+    reentrega al vencer su visibilidad."""
+    if cola is None:
+        cola = ColaFacturas.obtener_cola()
+    procesados = 0
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        mensajes = cola.recibir(tamano_lote)
+        if not mensajes:
+            break
+        fallos = set(procesar_lote(mensajes, {id_mensaje: cola.intentos(id_mensaje) for id_mensaje, _ in mensajes}))
+        cola.confirmar([id_mensaje for id_mensaje, _ in mensajes if id_mensaje not in fallos])
+        procesados += len(mensajes)
+        lotes += 1
+    return procesados
+
+def drenar_en_bucle(intervalo=1.0):
+    """Worker para la cola en memoria de ServidorLocal.py"""
+    while True:
+        try:
+            drenar_cola()
+        except Exception as e:
+            logger.error(f"Error drenando la cola de facturas: {str(e)}", exc_info=True)
+        time.sleep(intervalo)
+
+# --- Handler del worker (evento SQS con ReportBatchItemFailures) ---
+def lambda_handler(event, context):
+    records = event.get('Records', [])
+    logger.info(f"Iniciando lambda 'procesar_facturas' con {len(records)} mensajes.")
+
+    mensajes = []
+    intentos = {}
+    for record in records:
+        try:
+            mensajes.append((record['messageId'], json.loads(record['body'])))
+        except json.JSONDecodeError as e:
+            logger.error(f"Mensaje {record.get('messageId')} con JSON inválido descartado: {str(e)}")
+            continue
+        intentos[record['messageId']] = int((record.get('attributes') or {}).get('ApproximateReceiveCount', 1))
+
+    fallos = procesar_lote(mensajes, intentos)
+    return {'batchItemFailures': [{'itemIdentifier': id_mensaje} for id_mensaje in fallos]}
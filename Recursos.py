@@ -0,0 +1,65 @@
+import os
+import logging
+import threading
+from functools import lru_cache, wraps
+
+# --- Configuración compartida ---
+# Todas las lambdas (y el Router) importan este módulo, de modo que dentro de un
+# mismo contenedor existe un único juego de clientes y una única configuración.
+# Los clientes se crean al primer uso: cada función paga en su arranque en frío
+# solo por los clientes que realmente utiliza.
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'facturas-api-dev')
+S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', 'pf-facturas-sergio')
+USUARIO_LAMBDA_URL = 'https://30ipk5jpl6.execute-api.us-east-1.amazonaws.com/dev/usuarios/obtener'
+PRODUCTO_LAMBDA_URL = 'https://1kobbmlfu9.execute-api.us-east-1.amazonaws.com/dev/productos/obtener'
+ATHENA_REPAIR_LAMBDA_NAME = os.environ.get('ATHENA_REPAIR_LAMBDA_NAME', 'AthenaRepairTableFacturas')
+
+# Creación asíncrona de facturas (ver ColaFacturas.py)
+FACTURAS_COLA_BACKEND = os.environ.get('FACTURAS_COLA_BACKEND', 'sqs')  # 'sqs' o 'memoria'
+FACTURAS_QUEUE_URL = os.environ.get('FACTURAS_QUEUE_URL', '')
+ESTADO_TABLE_NAME = os.environ.get('ESTADO_TABLE_NAME', 'facturas-api-dev-estado')
+TAMANO_LOTE_FACTURAS = int(os.environ.get('TAMANO_LOTE_FACTURAS', '10'))
+# Debe coincidir con maxReceiveCount de la cola (ambos salen de entorno.yml)
+FACTURAS_MAX_INTENTOS = int(os.environ.get('FACTURAS_MAX_INTENTOS', '5'))
+# Consultas externas y escrituras a S3 simultáneas por lote del worker
+MAX_OPERACIONES_PARALELAS = 8
+
+# boto3.client()/resource() sobre la sesión por defecto no es thread-safe y el
+# primer uso puede ocurrir dentro del pool de hilos del worker: la creación se
+# serializa con un lock (reentrante, porque tabla_facturas usa recurso_dynamodb).
+_lock_clientes = threading.RLock()
+
+def _compartido(funcion):
+    """lru_cache cuyo primer cálculo por argumento ocurre bajo _lock_clientes"""
+    en_cache = lru_cache(maxsize=None)(funcion)
+
+    @wraps(funcion)
+    def envoltura(*args):
+        with _lock_clientes:
+            return en_cache(*args)
+    envoltura.cache_clear = en_cache.cache_clear
+    return envoltura
+
+@_compartido
+def recurso_dynamodb():
+    import boto3
+    return boto3.resource('dynamodb')
+
+@_compartido
+def tabla_facturas():
+    return recurso_dynamodb().Table(DYNAMODB_TABLE_NAME)
+
+@_compartido
+def cliente(servicio):
+    """Cliente de boto3 compartido para 's3', 'glue', 'lambda', 'sqs', ..."""
+    import boto3
+    return boto3.client(servicio)
+
+@_compartido
+def http_pool():
+    import urllib3
+    # Una conexión keep-alive por hilo del worker, para no descartarlas
+    return urllib3.PoolManager(maxsize=MAX_OPERACIONES_PARALELAS)
@@ -0,0 +1,133 @@
+import os
+import gzip
+import json
+import base64
+import binascii
+from functools import wraps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Compresión de respuestas ---
+# Las respuestas grandes (listados, facturas con productos y usuario_info) se
+# comprimen según Accept-Encoding y se devuelven en base64 para el soporte
+# binario de API Gateway (binaryMediaTypes en serverless.yml). API Gateway solo
+# decodifica el base64 si el primer tipo del header Accept está en
+# binaryMediaTypes, así que TIPOS_BINARIOS debe coincidir con esa lista.
+# brotli solo se usa si el paquete está instalado; en Lambda no se empaqueta.
+COMPRESION_MINIMA = int(os.environ.get('RESPUESTA_COMPRESION_MINIMA', '1024'))  # bytes
+NIVEL_GZIP = int(os.environ.get('RESPUESTA_NIVEL_GZIP', '6'))
+NIVEL_BROTLI = int(os.environ.get('RESPUESTA_NIVEL_BROTLI', '4'))
+TIPOS_BINARIOS = {t.strip().lower() for t in os.environ.get('RESPUESTA_TIPOS_BINARIOS', 'application/json').split(',')}
+VARY = 'Accept, Accept-Encoding'
+
+# Orden de preferencia ante igual calidad (q) en Accept-Encoding
+CODIFICACIONES = ('br', 'gzip') if brotli else ('gzip',)
+
+def _header(headers, nombre):
+    for clave, valor in (headers or {}).items():
+        if clave.lower() == nombre:
+            return valor
+    return None
+
+def elegir_codificacion(accept_encoding):
+    """Devuelve 'br', 'gzip' o None según el header Accept-Encoding"""
+    if not accept_encoding:
+        return None
+    calidades = {}
+    for parte in accept_encoding.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith('q='):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        calidades[nombre.strip().lower()] = q
+    comodin = calidades.get('*', 0.0)
+    candidatas = [(calidades.get(c, comodin), -i, c) for i, c in enumerate(CODIFICACIONES)]
+    q, _, codificacion = max(candidatas)
+    return codificacion if q > 0 else None
+
+def comprimir(datos, codificacion, nivel=None):
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=NIVEL_BROTLI if nivel is None else nivel)
+    return gzip.compress(datos, compresslevel=NIVEL_GZIP if nivel is None else nivel, mtime=0)
+
+def acepta_binario(accept):
+    """True si API Gateway entregará como binario una respuesta para este Accept"""
+    if not accept:
+        return False
+    primero = accept.split(',')[0].split(';')[0].strip().lower()
+    return primero in TIPOS_BINARIOS
+
+def comprimir_respuesta(event, respuesta):
+    """Comprime el body de una respuesta de API Gateway si el cliente lo acepta
+    y supera COMPRESION_MINIMA bytes; en otro caso la devuelve sin comprimir.
+    Siempre agrega Vary para que los caches distingan ambas variantes."""
+    headers = respuesta.get('headers') or {}
+    body = respuesta.get('body')
+    if respuesta.get('isBase64Encoded') or _header(headers, 'content-encoding'):
+        return respuesta
+    headers = {**headers, 'Vary': VARY}
+    sin_comprimir = {**respuesta, 'headers': headers}
+    if not isinstance(body, str):
+        return sin_comprimir
+
+    headers_evento = event.get('headers')
+    if not acepta_binario(_header(headers_evento, 'accept')):
+        return sin_comprimir
+    codificacion = elegir_codificacion(_header(headers_evento, 'accept-encoding'))
+    datos = body.encode('utf-8')
+    if codificacion is None or len(datos) < COMPRESION_MINIMA:
+        return sin_comprimir
+
+    comprimido = comprimir(datos, codificacion)
+    if len(comprimido) >= len(datos):
+        return sin_comprimir
+
+    return {
+        **respuesta,
+        'headers': {**headers, 'Content-Encoding': codificacion},
+        'body': base64.b64encode(comprimido).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+class CuerpoInvalido(ValueError):
+    pass
+
+def decodificar_evento(event):
+    """Con binaryMediaTypes activo API Gateway entrega el body en base64; lo
+    devuelve como texto para que los handlers lo parseen como siempre.
+    Lanza CuerpoInvalido si el body no es base64 o UTF-8 válido."""
+    if not event.get('isBase64Encoded') or not isinstance(event.get('body'), str):
+        return event
+    try:
+        body = base64.b64decode(event['body'], validate=True).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise CuerpoInvalido(str(e))
+    return {**event, 'body': body, 'isBase64Encoded': False}
+
+def con_evento_decodificado(handler):
+    """Decora un lambda_handler: decodifica el body y responde 400 si no es válido"""
+    @wraps(handler)
+    def envoltura(event, context):
+        try:
+            event = decodificar_evento(event)
+        except CuerpoInvalido as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'error': 'El body del request no es texto UTF-8 válido',
+                    'detalle': str(e)
+                }, indent=2, ensure_ascii=False)
+            }
+        return handler(event, context)
+    return envoltura
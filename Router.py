@@ -0,0 +1,58 @@
+import json
+
+# Todas las rutas comparten el mismo contenedor: clientes, configuración y cachés
+# de Recursos.py se inicializan una sola vez y las rutas poco usadas se mantienen
+# calientes gracias al tráfico de las demás.
+import CrearFactura
+import ListarFacturas
+import ObtenerFacturaPorId
+import ActualizarFactura
+import EliminarFactura
+import CrearFacturaAsync
+import EstadoFactura
+from Recursos import logger
+from Respuestas import con_evento_decodificado, comprimir_respuesta
+
+RUTAS = {
+    '/factura/crear': CrearFactura.lambda_handler,
+    '/factura/listar': ListarFacturas.lambda_handler,
+    '/factura/obtener': ObtenerFacturaPorId.lambda_handler,
+    '/factura/actualizar': ActualizarFactura.lambda_handler,
+    '/factura/eliminar': EliminarFactura.lambda_handler,
+    '/factura/crear-async': CrearFacturaAsync.lambda_handler,
+    '/factura/estado': EstadoFactura.lambda_handler,
+}
+
+def resolver_ruta(event):
+    """Obtiene el handler correspondiente a la ruta del evento de API Gateway"""
+    # 'resource' (REST API) no incluye el stage; 'path'/'rawPath' pueden incluirlo
+    for clave in ('resource', 'path', 'rawPath'):
+        ruta = event.get(clave)
+        if not ruta:
+            continue
+        ruta = '/' + ruta.strip('/')
+        if ruta in RUTAS:
+            return RUTAS[ruta]
+        for prefijo, handler in RUTAS.items():
+            if ruta.endswith(prefijo):
+                return handler
+    return None
+
+@con_evento_decodificado
+def lambda_handler(event, context):
+    handler = resolver_ruta(event)
+    if handler is None:
+        ruta = event.get('path') or event.get('rawPath')
+        logger.warning(f"Ruta no encontrada: {ruta}")
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({
+                'error': 'Ruta no encontrada',
+                'detalle': f'No existe un handler para la ruta {ruta}.'
+            }, indent=2, ensure_ascii=False)
+        }
+    return comprimir_respuesta(event, handler(event, context))
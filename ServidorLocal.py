@@ -0,0 +1,91 @@
+import base64
+import os
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+import Router
+import ProcesarFacturas
+from Recursos import FACTURAS_COLA_BACKEND
+
+# Servidor HTTP de desarrollo que envuelve Router.lambda_handler, para ejecutar
+# y hacer pruebas de carga del mismo código fuera de Lambda.
+#   python ServidorLocal.py [puerto]
+# Con FACTURAS_COLA_BACKEND=memoria también drena la cola de creación asíncrona.
+
+class ContextoLocal:
+    """Imitación mínima del objeto context de Lambda"""
+    function_name = 'facturas-api-local'
+    memory_limit_in_mb = 128
+
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+
+    def get_remaining_time_in_millis(self):
+        return 29000
+
+def construir_evento(metodo, ruta, headers, cuerpo):
+    """Arma un evento con el formato de proxy de API Gateway (REST)"""
+    partes = urlsplit(ruta)
+    query = dict(parse_qsl(partes.query)) or None
+    # Como API Gateway: si el body no es texto UTF-8 se entrega en base64
+    body, es_base64 = None, False
+    if cuerpo:
+        try:
+            body = cuerpo.decode('utf-8')
+        except UnicodeDecodeError:
+            body, es_base64 = base64.b64encode(cuerpo).decode('ascii'), True
+    return {
+        'resource': partes.path,
+        'path': partes.path,
+        'httpMethod': metodo,
+        'headers': dict(headers),
+        'queryStringParameters': query,
+        'body': body,
+        'isBase64Encoded': es_base64,
+        'requestContext': {'stage': 'local', 'requestId': str(uuid.uuid4())}
+    }
+
+class ManejadorFacturas(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _despachar(self):
+        longitud = int(self.headers.get('Content-Length') or 0)
+        cuerpo = self.rfile.read(longitud) if longitud else b''
+        evento = construir_evento(self.command, self.path, self.headers, cuerpo)
+        respuesta = Router.lambda_handler(evento, ContextoLocal())
+
+        datos = respuesta.get('body') or ''
+        if respuesta.get('isBase64Encoded'):
+            datos = base64.b64decode(datos)
+        else:
+            datos = datos.encode('utf-8')
+
+        self.send_response(respuesta.get('statusCode', 200))
+        for nombre, valor in (respuesta.get('headers') or {}).items():
+            self.send_header(nombre, valor)
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    do_GET = _despachar
+    do_POST = _despachar
+
+def main():
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.environ.get('PORT', 8000))
+    servidor = ThreadingHTTPServer(('0.0.0.0', puerto), ManejadorFacturas)
+    if FACTURAS_COLA_BACKEND == 'memoria':
+        threading.Thread(target=ProcesarFacturas.drenar_en_bucle, daemon=True).start()
+        print("Worker de facturas asíncronas iniciado (cola en memoria)")
+    print(f"Servidor local de facturas escuchando en http://localhost:{puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == '__main__':
+    main()
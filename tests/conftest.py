@@ -0,0 +1,102 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import ColaFacturas
+import ProcesarFacturas
+
+
+class TablaFalsa:
+    """Tabla de DynamoDB en memoria; `fallos_batch` hace fallar los próximos batch_writer"""
+    def __init__(self):
+        self.items = {}
+        self.fallos_batch = 0
+
+    def put_item(self, Item):
+        self.items[(Item['tenant_id'], Item['factura_id'])] = Item
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        """Como boto3: sin overwrite_by_pkeys, claves repetidas en el mismo
+        BatchWriteItem hacen que DynamoDB rechace todo el lote"""
+        tabla = self
+
+        class Batch:
+            def __enter__(self):
+                if tabla.fallos_batch:
+                    tabla.fallos_batch -= 1
+                    raise RuntimeError('ProvisionedThroughputExceededException')
+                self.pendientes = {} if overwrite_by_pkeys else []
+                return self
+
+            def __exit__(self, tipo, *args):
+                if tipo is not None:
+                    return False
+                items = list(self.pendientes.values()) if overwrite_by_pkeys else self.pendientes
+                claves = [(i['tenant_id'], i['factura_id']) for i in items]
+                if len(claves) != len(set(claves)):
+                    raise RuntimeError('ValidationException: Provided list of item keys contains duplicates')
+                for item in items:
+                    tabla.put_item(item)
+                return False
+
+            def put_item(self, Item):
+                if overwrite_by_pkeys:
+                    self.pendientes[tuple(Item[k] for k in overwrite_by_pkeys)] = Item
+                else:
+                    self.pendientes.append(Item)
+
+        return Batch()
+
+
+class ServiciosFalsos:
+    """Reemplaza las consultas de usuarios y productos y cuenta cada llamada"""
+    def __init__(self):
+        self.usuarios = {('t1', 'u1'): {'id': 'u1', 'nombres': 'Ana'}}
+        self.productos = {('t1', 'p1'): {'nombre': 'Mouse', 'precio': '10.5'},
+                          ('t1', 'p2'): {'nombre': 'Teclado', 'precio': '20'}}
+        self.llamadas = []
+        self.transitorios = set()  # claves que fallan una vez con ErrorServicioExterno
+        self.caidos = set()  # claves que siempre fallan con ErrorServicioExterno
+
+    def _consultar(self, datos, clave):
+        self.llamadas.append(clave)
+        if clave in self.caidos:
+            raise ProcesarFacturas.ErrorServicioExterno('Status 503')
+        if clave in self.transitorios:
+            self.transitorios.discard(clave)
+            raise ProcesarFacturas.ErrorServicioExterno('Status 503')
+        return datos.get(clave)
+
+    def obtener_usuario(self, tenant_id, usuario_id):
+        return self._consultar(self.usuarios, (tenant_id, usuario_id))
+
+    def obtener_producto(self, tenant_id, prod_id):
+        return self._consultar(self.productos, (tenant_id, prod_id))
+
+
+@pytest.fixture
+def entorno(monkeypatch):
+    cola = ColaFacturas.ColaMemoria(visibilidad=0)
+    estados = ColaFacturas.EstadosMemoria()
+    tabla = TablaFalsa()
+    servicios = ServiciosFalsos()
+    archivadas = []
+    athena = []
+
+    monkeypatch.setattr(ColaFacturas, '_cola', cola)
+    monkeypatch.setattr(ColaFacturas, '_estados', estados)
+    monkeypatch.setattr(ProcesarFacturas, 'tabla_facturas', lambda: tabla)
+    monkeypatch.setattr(ProcesarFacturas, 'obtener_usuario', servicios.obtener_usuario)
+    monkeypatch.setattr(ProcesarFacturas, 'obtener_producto', servicios.obtener_producto)
+    monkeypatch.setattr(ProcesarFacturas, 'archivar_en_s3', lambda factura: archivadas.append(factura['factura_id']))
+    monkeypatch.setattr(ProcesarFacturas, 'add_partition_to_glue', lambda *args: None)
+    monkeypatch.setattr(ProcesarFacturas, 'invocar_reparacion_athena', athena.append)
+
+    class Entorno:
+        pass
+    e = Entorno()
+    e.cola, e.estados, e.tabla, e.servicios, e.archivadas, e.athena = cola, estados, tabla, servicios, archivadas, athena
+    return e
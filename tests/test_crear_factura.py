@@ -0,0 +1,42 @@
+import pytest
+
+import CrearFactura
+
+
+class RespuestaFalsa:
+    def __init__(self, status, data=b'{}'):
+        self.status = status
+        self.data = data
+
+
+class PoolFalso:
+    def __init__(self, resultado):
+        self.resultado = resultado
+
+    def request(self, *args, **kwargs):
+        if isinstance(self.resultado, Exception):
+            raise self.resultado
+        return self.resultado
+
+
+def usar_pool(monkeypatch, resultado):
+    monkeypatch.setattr(CrearFactura, 'http_pool', lambda: PoolFalso(resultado))
+
+
+def test_obtener_datos_externos_devuelve_json(monkeypatch):
+    usar_pool(monkeypatch, RespuestaFalsa(200, b'{"user": {"id": "u1"}}'))
+    assert CrearFactura.obtener_datos_externos('http://x') == {'user': {'id': 'u1'}}
+
+
+@pytest.mark.parametrize('status', [400, 404])
+def test_obtener_datos_externos_no_encontrado(monkeypatch, status):
+    usar_pool(monkeypatch, RespuestaFalsa(status))
+    assert CrearFactura.obtener_datos_externos('http://x') is None
+
+
+@pytest.mark.parametrize('resultado', [RespuestaFalsa(500), RespuestaFalsa(503), RespuestaFalsa(429),
+                                       TimeoutError('read timed out')])
+def test_obtener_datos_externos_error_transitorio(monkeypatch, resultado):
+    usar_pool(monkeypatch, resultado)
+    with pytest.raises(CrearFactura.ErrorServicioExterno):
+        CrearFactura.obtener_datos_externos('http://x')
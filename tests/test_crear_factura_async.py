@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import ColaFacturas
+import CrearFacturaAsync
+
+
+class Contexto:
+    aws_request_id = 'test'
+
+
+def crear(body):
+    return CrearFacturaAsync.lambda_handler({'body': json.dumps(body)}, Contexto())
+
+
+@pytest.mark.parametrize('body', [
+    {'tenant_id': 't1', 'usuario_id': 'u1'},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': 'abc'},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': ['p1']},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'cantidad': 1}]},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': ['p1']}]},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': {'x': 1}}]},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': True}]},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': 'p1', 'cantidad': 'dos'}]},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': 'p1', 'cantidad': 0}]},
+    {'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': 'p1', 'cantidad': True}]},
+    {'tenant_id': 't1', 'usuario_id': 7, 'productos': [{'id': 'p1'}]},
+    ['no', 'es', 'objeto'],
+])
+def test_payload_invalido_devuelve_400_sin_encolar(entorno, body):
+    respuesta = crear(body)
+
+    assert respuesta['statusCode'] == 400
+    assert len(entorno.cola) == 0
+
+
+def test_payload_valido_devuelve_202_y_queda_pendiente(entorno):
+    respuesta = crear({'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': 'p1', 'cantidad': 3}]})
+
+    assert respuesta['statusCode'] == 202
+    body = json.loads(respuesta['body'])
+    assert body['estado_url'].startswith('/factura/estado?')
+    assert respuesta['headers']['Location'] == body['estado_url']
+    assert entorno.estados.obtener('t1', body['factura_id'])['estado'] == ColaFacturas.ESTADO_PENDIENTE
+    assert len(entorno.cola) == 1
+
+
+def test_error_al_encolar_marca_la_solicitud_como_fallida(entorno, monkeypatch):
+    def enviar(mensaje):
+        raise RuntimeError('SQS no disponible')
+    monkeypatch.setattr(entorno.cola, 'enviar', enviar)
+    registros = []
+    registrar = entorno.estados.registrar
+    monkeypatch.setattr(entorno.estados, 'registrar',
+                        lambda *args: (registros.append(args), registrar(*args)))
+
+    respuesta = crear({'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': 'p1'}]})
+
+    assert respuesta['statusCode'] == 500
+    factura_id = registros[0][1]
+    assert entorno.estados.obtener('t1', factura_id)['estado'] == ColaFacturas.ESTADO_FALLIDA
+
+
+def test_id_de_producto_entero_es_valido(entorno):
+    assert crear({'tenant_id': 't1', 'usuario_id': 'u1', 'productos': [{'id': 42}]})['statusCode'] == 202
@@ -0,0 +1,204 @@
+import json
+
+import ColaFacturas
+import CrearFacturaAsync
+import ProcesarFacturas
+
+
+class Contexto:
+    aws_request_id = 'test'
+
+
+def encolar(body):
+    respuesta = CrearFacturaAsync.lambda_handler({'body': json.dumps(body)}, Contexto())
+    assert respuesta['statusCode'] == 202, respuesta['body']
+    return json.loads(respuesta['body'])['factura_id']
+
+
+def estado(entorno, factura_id):
+    return entorno.estados.obtener('t1', factura_id)['estado']
+
+
+def solicitud(*productos, usuario_id='u1'):
+    return {'tenant_id': 't1', 'usuario_id': usuario_id,
+            'productos': [{'id': p, 'cantidad': 2} for p in productos]}
+
+
+def test_consultas_deduplicadas_en_el_lote(entorno):
+    ids = [encolar(solicitud('p1', 'p2')) for _ in range(3)] + [encolar(solicitud('p1'))]
+    assert all(estado(entorno, i) == ColaFacturas.ESTADO_PENDIENTE for i in ids)
+
+    assert ProcesarFacturas.drenar_cola(tamano_lote=10) == 4
+
+    assert sorted(entorno.servicios.llamadas) == [('t1', 'p1'), ('t1', 'p2'), ('t1', 'u1')]
+    assert all(estado(entorno, i) == ColaFacturas.ESTADO_COMPLETADA for i in ids)
+    assert sorted(entorno.archivadas) == sorted(ids)
+    assert entorno.tabla.items[('t1', ids[0])]['total'] == 61
+    assert len(entorno.cola) == 0
+
+
+def test_mensajes_invalidos_fallan_por_separado(entorno):
+    buena = {'tenant_id': 't1', 'factura_id': 'f-ok', 'usuario_id': 'u1', 'productos': [{'id': 'p1'}]}
+    malas = [
+        {'tenant_id': 't1', 'factura_id': 'f-str', 'usuario_id': 'u1', 'productos': 'abc'},
+        {'tenant_id': 't1', 'factura_id': 'f-cant', 'usuario_id': 'u1', 'productos': [{'id': 'p1', 'cantidad': 'dos'}]},
+        {'tenant_id': 't1', 'factura_id': 'f-id', 'usuario_id': 'u1', 'productos': [{'id': ['p1']}]},
+        {'tenant_id': 't1', 'factura_id': 'f-user', 'usuario_id': 'nadie', 'productos': [{'id': 'p1'}]},
+        {'tenant_id': 't1', 'factura_id': 'f-prod', 'usuario_id': 'u1', 'productos': [{'id': 'p9'}]},
+        'no es un objeto',
+    ]
+    mensajes = [(f'm{n}', m) for n, m in enumerate([buena] + malas)]
+
+    assert ProcesarFacturas.procesar_lote(mensajes) == []
+
+    assert estado(entorno, 'f-ok') == ColaFacturas.ESTADO_COMPLETADA
+    for factura_id in ('f-str', 'f-cant', 'f-id', 'f-user', 'f-prod'):
+        registro = entorno.estados.obtener('t1', factura_id)
+        assert registro['estado'] == ColaFacturas.ESTADO_FALLIDA
+        assert registro['error']
+    assert entorno.archivadas == ['f-ok']
+
+
+def test_error_transitorio_de_servicio_se_reintenta(entorno):
+    afectada = encolar(solicitud('p2'))
+    otra = encolar(solicitud('p1'))
+    entorno.servicios.transitorios.add(('t1', 'p2'))
+
+    ProcesarFacturas.drenar_cola(max_lotes=1)
+
+    assert estado(entorno, afectada) == ColaFacturas.ESTADO_PENDIENTE
+    assert estado(entorno, otra) == ColaFacturas.ESTADO_COMPLETADA
+    assert len(entorno.cola) == 1
+
+    ProcesarFacturas.drenar_cola(max_lotes=1)
+
+    assert estado(entorno, afectada) == ColaFacturas.ESTADO_COMPLETADA
+    assert len(entorno.cola) == 0
+
+
+def test_fallo_de_dynamodb_devuelve_el_mensaje_a_la_cola(entorno):
+    factura_id = encolar(solicitud('p1'))
+    entorno.tabla.fallos_batch = 1
+
+    ProcesarFacturas.drenar_cola(max_lotes=1)
+
+    assert estado(entorno, factura_id) == ColaFacturas.ESTADO_PENDIENTE
+    assert len(entorno.cola) == 1
+
+    ProcesarFacturas.drenar_cola(max_lotes=1)
+
+    assert estado(entorno, factura_id) == ColaFacturas.ESTADO_COMPLETADA
+    assert ('t1', factura_id) in entorno.tabla.items
+    assert len(entorno.cola) == 0
+
+
+def test_lambda_handler_reporta_batch_item_failures(entorno):
+    entorno.servicios.transitorios.add(('t1', 'u1'))
+    mensaje = {'tenant_id': 't1', 'factura_id': 'f1', 'usuario_id': 'u1', 'productos': [{'id': 'p1'}]}
+    event = {'Records': [{'messageId': 'm1', 'body': json.dumps(mensaje), 'attributes': {'ApproximateReceiveCount': '1'}},
+                         {'messageId': 'm2', 'body': '{no json'}]}
+
+    respuesta = ProcesarFacturas.lambda_handler(event, Contexto())
+
+    assert respuesta == {'batchItemFailures': [{'itemIdentifier': 'm1'}]}
+
+
+def test_cola_memoria_reentrega_mensajes_no_confirmados():
+    cola = ColaFacturas.ColaMemoria(visibilidad=0)
+    cola.enviar({'n': 1})
+    cola.enviar({'n': 2})
+
+    recibidos = cola.recibir(10)
+    cola.confirmar([recibidos[0][0]])
+
+    assert [m for _, m in cola.recibir(10)] == [{'n': 2}]
+
+
+def test_cola_memoria_oculta_mensajes_en_vuelo():
+    cola = ColaFacturas.ColaMemoria(visibilidad=60)
+    cola.enviar({'n': 1})
+
+    assert len(cola.recibir(10)) == 1
+    assert cola.recibir(10) == []
+    assert len(cola) == 1
+
+
+def test_reintentos_agotados_marcan_fallida(entorno, monkeypatch):
+    monkeypatch.setattr(ProcesarFacturas, 'FACTURAS_MAX_INTENTOS', 2)
+    factura_id = encolar(solicitud('p2'))
+    entorno.servicios.caidos.add(('t1', 'p2'))
+
+    ProcesarFacturas.drenar_cola(max_lotes=1)
+
+    assert estado(entorno, factura_id) == ColaFacturas.ESTADO_PENDIENTE
+    assert len(entorno.cola) == 1
+
+    ProcesarFacturas.drenar_cola(max_lotes=1)
+
+    registro = entorno.estados.obtener('t1', factura_id)
+    assert registro['estado'] == ColaFacturas.ESTADO_FALLIDA
+    assert registro['error'].startswith('Reintentos agotados')
+    assert len(entorno.cola) == 0
+
+
+def test_lambda_handler_ultimo_intento_marca_fallida(entorno):
+    entorno.servicios.caidos.add(('t1', 'u1'))
+    mensajes = [{'tenant_id': 't1', 'factura_id': f, 'usuario_id': 'u1', 'productos': [{'id': 'p1'}]}
+                for f in ('f-intermedio', 'f-ultimo')]
+    event = {'Records': [
+        {'messageId': 'm1', 'body': json.dumps(mensajes[0]),
+         'attributes': {'ApproximateReceiveCount': str(ProcesarFacturas.FACTURAS_MAX_INTENTOS - 1)}},
+        {'messageId': 'm2', 'body': json.dumps(mensajes[1]),
+         'attributes': {'ApproximateReceiveCount': str(ProcesarFacturas.FACTURAS_MAX_INTENTOS)}},
+    ]}
+
+    respuesta = ProcesarFacturas.lambda_handler(event, Contexto())
+
+    assert respuesta == {'batchItemFailures': [{'itemIdentifier': 'm1'}]}
+    assert entorno.estados.obtener('t1', 'f-intermedio') is None
+    registro = entorno.estados.obtener('t1', 'f-ultimo')
+    assert registro['estado'] == ColaFacturas.ESTADO_FALLIDA
+    assert registro['error'] == "Reintentos agotados: La consulta de 'u1' falló de forma transitoria"
+
+
+def test_fallo_de_s3_en_el_ultimo_intento_marca_fallida(entorno, monkeypatch):
+    def archivar(factura):
+        raise RuntimeError('SlowDown')
+    monkeypatch.setattr(ProcesarFacturas, 'archivar_en_s3', archivar)
+    mensaje = {'tenant_id': 't1', 'factura_id': 'f1', 'usuario_id': 'u1', 'productos': [{'id': 'p1'}]}
+
+    fallos = ProcesarFacturas.procesar_lote([('m1', mensaje)], {'m1': ProcesarFacturas.FACTURAS_MAX_INTENTOS})
+
+    assert fallos == []
+    assert estado(entorno, 'f1') == ColaFacturas.ESTADO_FALLIDA
+
+
+def test_mensaje_duplicado_en_el_lote(entorno):
+    mensaje = {'tenant_id': 't1', 'factura_id': 'f1', 'usuario_id': 'u1', 'productos': [{'id': 'p1'}]}
+
+    assert ProcesarFacturas.procesar_lote([('m1', mensaje), ('m2', dict(mensaje))]) == []
+
+    assert estado(entorno, 'f1') == ColaFacturas.ESTADO_COMPLETADA
+    assert list(entorno.tabla.items) == [('t1', 'f1')]
+
+
+def test_payload_de_athena_conserva_factura_id(entorno):
+    ids = [encolar(solicitud('p1')) for _ in range(2)]
+
+    ProcesarFacturas.drenar_cola()
+
+    assert len(entorno.athena) == 1
+    payload = entorno.athena[0]
+    assert payload['detail'] == 'new_invoice_created'
+    assert payload['factura_id'] in ids
+    assert sorted(payload['factura_ids']) == sorted(ids)
+
+
+def test_cola_memoria_cuenta_intentos():
+    cola = ColaFacturas.ColaMemoria(visibilidad=0)
+    cola.enviar({'n': 1})
+
+    (id1, _), = cola.recibir(10)
+    assert cola.intentos(id1) == 1
+    (id2, _), = cola.recibir(10)
+    assert cola.intentos(id2) == 2
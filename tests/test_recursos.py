@@ -0,0 +1,34 @@
+import sys
+import threading
+import time
+import types
+
+import Recursos
+
+
+def test_cliente_se_crea_una_sola_vez_entre_hilos(monkeypatch):
+    creados = []
+
+    def client(servicio):
+        creados.append(servicio)
+        time.sleep(0.01)  # ensancha la ventana de la carrera
+        return object()
+
+    monkeypatch.setitem(sys.modules, 'boto3', types.SimpleNamespace(client=client))
+    Recursos.cliente.cache_clear()
+    inicio = threading.Barrier(8)
+    resultados = []
+
+    def usar():
+        inicio.wait()
+        resultados.append(Recursos.cliente('s3'))
+
+    hilos = [threading.Thread(target=usar) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    Recursos.cliente.cache_clear()
+
+    assert creados == ['s3']
+    assert len({id(r) for r in resultados}) == 1
@@ -0,0 +1,78 @@
+import base64
+import gzip
+import json
+
+import Respuestas
+import Router
+
+
+class Contexto:
+    aws_request_id = 'test'
+
+
+GRANDE = json.dumps({'facturas': [{'factura_id': str(n), 'estado': 'activa'} for n in range(200)]}, indent=2)
+
+
+def respuesta(body=GRANDE):
+    return {'statusCode': 200, 'headers': {'Content-Type': 'application/json'}, 'body': body}
+
+
+def evento(**headers):
+    return {'headers': headers}
+
+
+def test_comprime_con_accept_json_y_gzip():
+    r = Respuestas.comprimir_respuesta(evento(Accept='application/json', **{'Accept-Encoding': 'gzip'}), respuesta())
+
+    assert r['isBase64Encoded'] is True
+    assert r['headers']['Content-Encoding'] == 'gzip'
+    assert r['headers']['Vary'] == Respuestas.VARY
+    assert gzip.decompress(base64.b64decode(r['body'])).decode('utf-8') == GRANDE
+
+
+def test_no_comprime_si_api_gateway_no_convertiria_a_binario():
+    r = Respuestas.comprimir_respuesta(evento(Accept='*/*', **{'Accept-Encoding': 'gzip'}), respuesta())
+
+    assert 'isBase64Encoded' not in r
+    assert r['body'] == GRANDE
+    assert r['headers']['Vary'] == Respuestas.VARY
+
+
+def test_vary_en_respuestas_pequenas_o_sin_accept_encoding():
+    pequena = Respuestas.comprimir_respuesta(evento(Accept='application/json', **{'Accept-Encoding': 'gzip'}),
+                                             respuesta('{}'))
+    sin_encoding = Respuestas.comprimir_respuesta(evento(Accept='application/json'), respuesta())
+
+    for r in (pequena, sin_encoding):
+        assert 'Content-Encoding' not in r['headers']
+        assert r['headers']['Vary'] == Respuestas.VARY
+
+
+def test_elegir_codificacion_respeta_q():
+    assert Respuestas.elegir_codificacion('gzip;q=0') is None
+    assert Respuestas.elegir_codificacion('identity') is None
+    assert Respuestas.elegir_codificacion('*') in Respuestas.CODIFICACIONES
+    assert Respuestas.elegir_codificacion('br;q=0, gzip;q=0.5') == 'gzip'
+
+
+def test_body_base64_se_decodifica():
+    body = json.dumps({'a': 'ñ'})
+    event = {'body': base64.b64encode(body.encode('utf-8')).decode('ascii'), 'isBase64Encoded': True}
+
+    assert Respuestas.decodificar_evento(event)['body'] == body
+
+
+def test_body_no_utf8_devuelve_400_en_el_router():
+    event = {'path': '/factura/listar', 'isBase64Encoded': True,
+             'body': base64.b64encode(b'\xff\xfe').decode('ascii')}
+
+    r = Router.lambda_handler(event, Contexto())
+
+    assert r['statusCode'] == 400
+
+
+def test_body_base64_invalido_devuelve_400_en_cada_handler():
+    event = {'isBase64Encoded': True, 'body': '%%%'}
+
+    for handler in set(Router.RUTAS.values()):
+        assert handler(event, Contexto())['statusCode'] == 400
@@ -0,0 +1,138 @@
+import base64
+import gzip
+import json
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import Router
+import ServidorLocal
+
+
+class Contexto:
+    aws_request_id = 'test'
+
+
+def eco(nombre):
+    def handler(event, context):
+        return {'statusCode': 200, 'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'handler': nombre, 'body': event.get('body')})}
+    return handler
+
+
+@pytest.fixture
+def rutas_eco(monkeypatch):
+    for ruta in list(Router.RUTAS):
+        monkeypatch.setitem(Router.RUTAS, ruta, eco(ruta))
+
+
+def manejado_por(event):
+    respuesta = Router.lambda_handler(event, Contexto())
+    assert respuesta['statusCode'] == 200, respuesta['body']
+    return json.loads(respuesta['body'])['handler']
+
+
+@pytest.mark.parametrize('event, esperado', [
+    ({'resource': '/factura/listar', 'path': '/dev/factura/listar'}, '/factura/listar'),
+    ({'path': '/factura/obtener'}, '/factura/obtener'),
+    ({'path': '/dev/factura/crear'}, '/factura/crear'),
+    ({'path': '/dev/factura/crear-async'}, '/factura/crear-async'),
+    ({'path': '/dev/factura/eliminar/'}, '/factura/eliminar'),
+    ({'rawPath': '/dev/factura/estado'}, '/factura/estado'),
+])
+def test_resuelve_rutas_con_y_sin_stage(rutas_eco, event, esperado):
+    assert manejado_por(event) == esperado
+
+
+def test_resource_tiene_prioridad_sobre_path(rutas_eco):
+    event = {'resource': '/factura/listar', 'path': '/dev/factura/obtener', 'rawPath': '/dev/factura/eliminar'}
+    assert manejado_por(event) == '/factura/listar'
+
+
+def test_resource_sin_coincidencia_usa_path(rutas_eco):
+    assert manejado_por({'resource': '/{proxy+}', 'path': '/dev/factura/actualizar'}) == '/factura/actualizar'
+
+
+@pytest.mark.parametrize('event', [
+    {'path': '/factura/desconocida'},
+    {'path': '/dev/factura'},
+    {},
+])
+def test_ruta_desconocida_devuelve_404(rutas_eco, event):
+    respuesta = Router.lambda_handler(event, Contexto())
+
+    assert respuesta['statusCode'] == 404
+    assert json.loads(respuesta['body'])['error'] == 'Ruta no encontrada'
+
+
+def test_router_comprime_la_respuesta_del_handler(monkeypatch):
+    grande = json.dumps({'facturas': ['x' * 40] * 100})
+    monkeypatch.setitem(Router.RUTAS, '/factura/listar',
+                        lambda event, context: {'statusCode': 200, 'headers': {}, 'body': grande})
+    event = {'path': '/factura/listar', 'headers': {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}}
+
+    respuesta = Router.lambda_handler(event, Contexto())
+
+    assert respuesta['headers']['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(base64.b64decode(respuesta['body'])).decode('utf-8') == grande
+
+
+def test_construir_evento_formato_api_gateway():
+    event = ServidorLocal.construir_evento('GET', '/factura/estado?tenant_id=t1&factura_id=f1',
+                                           {'Accept': 'application/json'}, b'')
+
+    assert event['resource'] == event['path'] == '/factura/estado'
+    assert event['httpMethod'] == 'GET'
+    assert event['queryStringParameters'] == {'tenant_id': 't1', 'factura_id': 'f1'}
+    assert event['headers'] == {'Accept': 'application/json'}
+    assert event['body'] is None
+    assert event['isBase64Encoded'] is False
+    assert event['requestContext']['stage'] == 'local'
+
+
+def test_construir_evento_body_texto_y_binario():
+    texto = ServidorLocal.construir_evento('POST', '/factura/crear', {}, '{"a": "ñ"}'.encode('utf-8'))
+    binario = ServidorLocal.construir_evento('POST', '/factura/crear', {}, b'\xff\xfe')
+
+    assert texto['queryStringParameters'] is None
+    assert (texto['body'], texto['isBase64Encoded']) == ('{"a": "ñ"}', False)
+    assert binario['isBase64Encoded'] is True
+    assert base64.b64decode(binario['body']) == b'\xff\xfe'
+
+
+@pytest.fixture
+def servidor():
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), ServidorLocal.ManejadorFacturas)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_servidor_local_despacha_al_router(rutas_eco, servidor):
+    peticion = urllib.request.Request(f"{servidor}/factura/listar", data=b'{"tenant_id": "t1"}', method='POST')
+
+    with urllib.request.urlopen(peticion) as respuesta:
+        assert respuesta.status == 200
+        assert respuesta.headers['Vary'] == 'Accept, Accept-Encoding'
+        assert json.loads(respuesta.read()) == {'handler': '/factura/listar', 'body': '{"tenant_id": "t1"}'}
+
+
+def test_servidor_local_envia_bytes_comprimidos(monkeypatch, servidor):
+    grande = json.dumps({'facturas': ['x' * 40] * 100})
+    monkeypatch.setitem(Router.RUTAS, '/factura/listar',
+                        lambda event, context: {'statusCode': 200, 'headers': {}, 'body': grande})
+    peticion = urllib.request.Request(f"{servidor}/factura/listar", data=b'{}', method='POST',
+                                      headers={'Accept': 'application/json', 'Accept-Encoding': 'gzip'})
+
+    with urllib.request.urlopen(peticion) as respuesta:
+        assert respuesta.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(respuesta.read()).decode('utf-8') == grande
+
+
+def test_servidor_local_ruta_desconocida(servidor):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(urllib.request.Request(f"{servidor}/otra", data=b'{}', method='POST'))
+    assert error.value.code == 404